@@ -1,115 +1,314 @@
 import sys
 import os
+import hashlib
 from datetime import datetime
 import argparse
+from collections import defaultdict
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from pptx import Presentation
 from pptx.util import Inches
 
-def load_campaign_data(filepath):
+try:
+    from numba import get_num_threads, njit, prange
+except ImportError:
+    njit = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
+CSV_DTYPES = {
+    'campaign': 'string',
+    'impressions': 'number',
+    'clicks': 'number',
+    'spend': 'string',
+    'revenue': 'number',
+}
+
+COLUMN_SYNONYMS = {
+    'campaign': ['Campaign_ID','campaign','Campaign','campaign_id'],
+    'date': ['Date','date','timestamp','Date_Stamp'],
+    'impressions': ['Impressions','impressions','views','Views'],
+    'clicks': ['Clicks','clicks','click_count'],
+    'spend': ['Acquisition_Cost','Spend','spend','cost','Cost'],
+    'revenue': ['ROI','Revenue','revenue','sales','conversion_value'],
+}
+
+REQUIRED_COLUMNS = ['campaign','date','impressions','clicks','spend']
+
+INSIGHT_TEMPLATES = (
+    "Our campaigns delivered {total_impressions:,} impressions and {total_clicks:,} clicks.",
+    "Total ad spend was ${total_spend:,.2f}, generating ${total_revenue:,.2f} in revenue.",
+    "The average click-through rate was {ctr_pct:.2f}%.",
+    "Each click cost ${avg_cpc:.2f}.",
+    "The best campaign was '{best_campaign}' with ROAS {best_roas:.2f}.",
+    "The lowest performing campaign was '{worst_campaign}' with ROAS {worst_roas:.2f}.",
+    "Overall ROAS was {avg_roas:.2f}."
+)
+
+CACHE_VERSION = 7
+CHUNK_SIZE = 200_000
+NUMBA_MIN_ROWS = 100_000
+ARROW_BLOCK_SIZE = 16 * 1024 * 1024
+RATIO_COLUMNS = ['ctr','cpc','roas']
+SUM_COLUMNS = ['impressions','clicks','spend','revenue'] + RATIO_COLUMNS
+COUNT_COLUMNS = [f'{col}_count' for col in RATIO_COLUMNS]
+
+def read_csv_header(filepath):
     if not os.path.exists(filepath):
         print(f"ERROR: Can't find file at {filepath}")
         sys.exit(1)
     try:
-        data = pd.read_csv(filepath)
-        return data
+        return pd.read_csv(filepath, nrows=0).columns
     except Exception as e:
         print(f"ERROR reading CSV file: {e}")
         sys.exit(1)
 
-def check_data_columns(data):
+def check_data_columns(columns):
+    lookup = {}
+    for col in columns:
+        lookup.setdefault(col.lower(), col)
     column_mapping = {}
 
-    for col in ['Campaign_ID','campaign','Campaign','campaign_id']:
-        if col in data.columns:
-            column_mapping['campaign'] = col
-            break
+    for std_name, synonyms in COLUMN_SYNONYMS.items():
+        match = next((syn for syn in synonyms if syn in columns), None)
+        if match is None:
+            match = next((lookup[syn.lower()] for syn in synonyms if syn.lower() in lookup), None)
+        if match is not None:
+            column_mapping[std_name] = match
 
-    for col in ['Date','date','timestamp','Date_Stamp']:
-        if col in data.columns:
-            column_mapping['date'] = col
-            break
+    return column_mapping
 
-    for col in ['Impressions','impressions','views','Views']:
-        if col in data.columns:
-            column_mapping['impressions'] = col
-            break
+def check_required_columns(column_map):
+    for col in REQUIRED_COLUMNS:
+        if col not in column_map:
+            print(f"ERROR: Missing required column '{col}'")
+            sys.exit(1)
 
-    for col in ['Clicks','clicks','click_count']:
-        if col in data.columns:
-            column_mapping['clicks'] = col
-            break
+def mapped_dtypes(column_map, type_names=None):
+    return {column_map[k]: type_names[v] if type_names else v
+            for k, v in CSV_DTYPES.items() if k in column_map}
+
+def read_arrow_batches(filepath, column_map):
+    column_types = mapped_dtypes(column_map, {'string': pa.string(), 'number': pa.string()})
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=list(column_types),
+        column_types=column_types,
+        strings_can_be_null=True,
+    )
+    read_options = pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE)
+    with pa_csv.open_csv(filepath, read_options=read_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+
+def load_campaign_data(filepath, column_map):
+    dtype_map = mapped_dtypes(column_map, {'string': 'string', 'number': None})
+    try:
+        if pa is not None:
+            yield from read_arrow_batches(filepath, column_map)
+        else:
+            with pd.read_csv(filepath, usecols=list(dtype_map),
+                             dtype={col: t for col, t in dtype_map.items() if t is not None},
+                             engine='c', chunksize=CHUNK_SIZE) as reader:
+                yield from reader
+    except Exception as e:
+        print(f"ERROR reading CSV file: {e}")
+        sys.exit(1)
 
-    for col in ['Acquisition_Cost','Spend','spend','cost','Cost']:
-        if col in data.columns:
-            column_mapping['spend'] = col
-            break
+def parse_numbers(values):
+    try:
+        if isinstance(values.dtype, pd.ArrowDtype):
+            parsed = pc.cast(pa.array(values), pa.float64()).to_numpy(zero_copy_only=False)
+            return pd.Series(parsed, index=values.index)
+        return values.astype('float64')
+    except (TypeError, ValueError):
+        return pd.to_numeric(values.astype('string'), errors='coerce').astype('float64')
 
-    for col in ['ROI','Revenue','revenue','sales','conversion_value']:
-        if col in data.columns:
-            column_mapping['revenue'] = col
-            break
+def clean_and_prepare_data(data, column_map):
+    data.rename(columns={orig_name: std_name for std_name, orig_name in column_map.items()}, inplace=True)
 
-    return column_mapping
+    data['impressions'] = parse_numbers(data['impressions'])
+    data['clicks'] = parse_numbers(data['clicks'])
+    data['spend'] = parse_numbers(data['spend'].str.replace(r'[$,]', '', regex=True))
 
-def clean_and_prepare_data(raw_data, column_map):
-    data = raw_data.copy()
+    if 'revenue' in data.columns:
+        data['revenue'] = parse_numbers(data['revenue'])
+    else:
+        data['revenue'] = data['spend'] * 2.5
 
-    for std_name, orig_name in column_map.items():
-        data = data.rename(columns={orig_name: std_name})
+    data.dropna(subset=['impressions','clicks','spend'], inplace=True)
+    data['campaign'] = data['campaign'].astype('category')
 
-    required = ['campaign','date','impressions','clicks','spend']
-    for col in required:
-        if col not in data.columns:
-            print(f"ERROR: Missing required column '{col}'")
-            sys.exit(1)
+    for col, fill in (('impressions', 1), ('clicks', 1), ('spend', 0.01)):
+        data[col] = np.where(data[col] == 0, fill, data[col])
+    data['revenue'] = data['revenue'].astype('float64')
 
-    data['spend'] = data['spend'].astype(str).str.replace('$','').str.replace(',','')
+    data['ctr'] = (data['clicks'] / data['impressions']).astype('float32')
+    data['cpc'] = (data['spend'] / data['clicks']).astype('float32')
+    data['roas'] = (data['revenue'] / data['spend']).astype('float32')
 
-    data['impressions'] = pd.to_numeric(data['impressions'], errors='coerce')
-    data['clicks'] = pd.to_numeric(data['clicks'], errors='coerce')
-    data['spend'] = pd.to_numeric(data['spend'], errors='coerce')
+    return data
 
-    if 'revenue' in data.columns:
-        data['revenue'] = pd.to_numeric(data['revenue'], errors='coerce')
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def sum_by_campaign_parallel(codes, values, n_groups, n_threads, n_counted):
+        n_rows, n_cols = values.shape
+        first_counted = n_cols - n_counted
+        step = (n_rows + n_threads - 1) // n_threads
+        sums = np.zeros((n_threads, n_groups, n_cols))
+        counts = np.zeros((n_threads, n_groups, n_counted))
+        for t in prange(n_threads):
+            for i in range(t * step, min(n_rows, (t + 1) * step)):
+                g = codes[i]
+                for j in range(n_cols):
+                    v = values[i, j]
+                    if not np.isnan(v):
+                        sums[t, g, j] += v
+                        if j >= first_counted:
+                            counts[t, g, j - first_counted] += 1
+        return sums.sum(axis=0), counts.sum(axis=0)
+
+def sum_by_campaign(codes, values, n_groups):
+    codes = codes.astype(np.intp)
+    n_counted = len(RATIO_COLUMNS)
+    if njit is not None and len(codes) >= NUMBA_MIN_ROWS:
+        n_threads = min(get_num_threads(), len(codes) // n_groups)
+        if n_threads >= 1:
+            return sum_by_campaign_parallel(codes, values, n_groups, n_threads, n_counted)
+
+    first_counted = values.shape[1] - n_counted
+    sums = np.empty((n_groups, values.shape[1]))
+    counts = np.empty((n_groups, n_counted))
+    for j in range(values.shape[1]):
+        valid = ~np.isnan(values[:, j])
+        sums[:, j] = np.bincount(codes[valid], weights=values[valid, j], minlength=n_groups)
+        if j >= first_counted:
+            counts[:, j - first_counted] = np.bincount(codes[valid], minlength=n_groups)
+    return sums, counts
+
+def stream_and_aggregate(filepath, column_map):
+    totals = defaultdict(lambda: np.zeros(len(SUM_COLUMNS) + len(COUNT_COLUMNS)))
+
+    for chunk in load_campaign_data(filepath, column_map):
+        chunk = clean_and_prepare_data(chunk, column_map)
+        campaigns = chunk['campaign'].cat.categories
+        codes = chunk['campaign'].cat.codes.to_numpy(dtype=np.intp)
+        missing = codes < 0
+        if missing.any():
+            codes[missing] = len(campaigns)
+            campaigns = campaigns.append(pd.Index([None]))
+        values = chunk[SUM_COLUMNS].to_numpy(dtype=np.float64)
+        sums, counts = sum_by_campaign(codes, values, len(campaigns))
+        for campaign, row in zip(campaigns, np.hstack([sums, counts])):
+            totals[campaign] += row
+
+    campaign_sums = pd.DataFrame.from_dict(totals, orient='index', columns=SUM_COLUMNS + COUNT_COLUMNS)
+    campaign_sums.index.name = 'campaign'
+    return campaign_sums.sort_index(key=campaign_sort_key)
+
+def campaign_sort_key(index):
+    numeric = pd.to_numeric(index, errors='coerce')
+    return numeric if numeric.notna().sum() == index.notna().sum() else index
+
+def aggregate_with_polars(filepath, column_map):
+    try:
+        import polars as pl
+    except ImportError:
+        print("ERROR: --engine polars requires the polars package")
+        sys.exit(1)
+
+    schema = mapped_dtypes(column_map, {'string': pl.String, 'number': pl.String})
+    if 'revenue' in column_map:
+        revenue = pl.col('revenue').cast(pl.Float64, strict=False)
     else:
-        data['revenue'] = data['spend'] * 2.5
+        revenue = pl.col('spend') * 2.5
+
+    query = (
+        pl.scan_csv(filepath, schema_overrides=schema)
+        .select([pl.col(orig).alias(std) for std, orig in column_map.items() if std in CSV_DTYPES])
+        .with_columns(
+            pl.col('impressions', 'clicks').cast(pl.Float64, strict=False),
+            pl.col('spend').str.replace_all(r'[$,]', '').cast(pl.Float64, strict=False),
+        )
+        .with_columns(revenue.alias('revenue'))
+        .drop_nulls(['impressions','clicks','spend'])
+        .with_columns(
+            pl.when(pl.col('impressions') == 0).then(1.0).otherwise(pl.col('impressions')).alias('impressions'),
+            pl.when(pl.col('clicks') == 0).then(1.0).otherwise(pl.col('clicks')).alias('clicks'),
+            pl.when(pl.col('spend') == 0).then(0.01).otherwise(pl.col('spend')).alias('spend'),
+        )
+        .with_columns(
+            (pl.col('clicks') / pl.col('impressions')).cast(pl.Float32).alias('ctr'),
+            (pl.col('spend') / pl.col('clicks')).cast(pl.Float32).alias('cpc'),
+            (pl.col('revenue') / pl.col('spend')).cast(pl.Float32).alias('roas'),
+        )
+        .group_by('campaign')
+        .agg(
+            pl.col(SUM_COLUMNS).cast(pl.Float64).sum(),
+            pl.col(RATIO_COLUMNS).count().cast(pl.Float64).name.suffix('_count'),
+        )
+    )
 
-    data = data.dropna(subset=['impressions','clicks','spend'])
+    try:
+        campaign_sums = query.collect(engine='streaming')
+    except Exception as e:
+        print(f"ERROR reading CSV file: {e}")
+        sys.exit(1)
 
-    data.loc[data['impressions'] == 0, 'impressions'] = 1
-    data.loc[data['clicks'] == 0, 'clicks'] = 1
-    data.loc[data['spend'] == 0, 'spend'] = 0.01
+    return campaign_sums.to_pandas().set_index('campaign').sort_index(key=campaign_sort_key)
 
-    data['ctr'] = data['clicks'] / data['impressions']
-    data['cpc'] = data['spend'] / data['clicks']
-    data['roas'] = data['revenue'] / data['spend']
+def campaign_cache_path(filepath, column_map, engine, cache_dir):
+    stat = os.stat(filepath)
+    source = os.path.abspath(filepath)
+    key = (f"{CACHE_VERSION}:{engine}:{sorted(column_map.items())}:"
+           f"{source}:{stat.st_mtime_ns}:{stat.st_size}")
+    prefix = hashlib.sha1(source.encode()).hexdigest()[:16]
+    return cache_dir / f"{prefix}-{hashlib.sha1(key.encode()).hexdigest()}.parquet"
 
+def load_campaign_cache(cache_path):
+    if not cache_path.exists():
+        return None
     try:
-        data['date'] = pd.to_datetime(data['date'])
-    except:
-        pass
+        return pd.read_parquet(cache_path)
+    except Exception:
+        return None
 
-    return data
+def save_campaign_cache(campaign_sums, cache_path):
+    try:
+        cache_path.parent.mkdir(exist_ok=True, parents=True)
+        campaign_sums.to_parquet(cache_path, compression='zstd')
+        prefix = cache_path.name.split('-')[0]
+        for stale in cache_path.parent.glob(f"{prefix}-*.parquet"):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except (ImportError, OSError):
+        pass
 
 def calculate_summary_stats(data):
+    totals = data[SUM_COLUMNS + COUNT_COLUMNS].sum()
     summary = {}
-    summary['total_impressions'] = int(data['impressions'].sum())
-    summary['total_clicks'] = int(data['clicks'].sum())
-    summary['total_spend'] = float(data['spend'].sum())
-    summary['total_revenue'] = float(data['revenue'].sum())
-    summary['avg_ctr'] = float(data['ctr'].mean())
-    summary['avg_cpc'] = float(data['cpc'].mean())
-    summary['avg_roas'] = float(data['roas'].mean())
-
-    campaign_stats = data.groupby('campaign').agg({
-        'roas': 'mean',
-        'revenue': 'sum',
-        'spend': 'sum'
+    summary['total_impressions'] = int(totals['impressions'])
+    summary['total_clicks'] = int(totals['clicks'])
+    summary['total_spend'] = float(totals['spend'])
+    summary['total_revenue'] = float(totals['revenue'])
+    summary['avg_ctr'] = float(totals['ctr'] / totals['ctr_count'])
+    summary['avg_cpc'] = float(totals['cpc'] / totals['cpc_count'])
+    summary['avg_roas'] = float(totals['roas'] / totals['roas_count'])
+
+    data = data[data.index.notna()]
+    campaign_stats = pd.DataFrame({
+        'roas': data['roas'] / data['roas_count'],
+        'revenue': data['revenue'],
+        'spend': data['spend'],
+        'impressions': data['impressions'],
+        'clicks': data['clicks']
     }).round(2)
 
     if not campaign_stats.empty:
@@ -121,44 +320,40 @@ def calculate_summary_stats(data):
         summary['worst_campaign'] = worst_idx
         summary['worst_roas'] = float(campaign_stats.loc[worst_idx, 'roas'])
 
-        top_5 = campaign_stats.nlargest(5, 'revenue')
-        summary['top_5_campaigns'] = top_5.to_dict('index')
+        revenue = campaign_stats['revenue'].to_numpy()
+        k = min(5, len(revenue))
+        cutoff = np.partition(revenue, -k)[-k]
+        candidates = np.flatnonzero(revenue >= cutoff)
+        top_idx = candidates[np.lexsort((candidates, -revenue[candidates]))][:k]
+        summary['top_5_campaigns'] = campaign_stats.iloc[top_idx].to_dict('index')
 
-    return summary
+    return summary, campaign_stats
 
-def generate_insights(summary_stats):
-    s = summary_stats
-    insights = [
-        f"Our campaigns delivered {s['total_impressions']:,} impressions and {s['total_clicks']:,} clicks.",
-        f"Total ad spend was ${s['total_spend']:,.2f}, generating ${s['total_revenue']:,.2f} in revenue.",
-        f"The average click-through rate was {s['avg_ctr']*100:.2f}%.",
-        f"Each click cost ${s['avg_cpc']:.2f}.",
-        f"The best campaign was '{s['best_campaign']}' with ROAS {s['best_roas']:.2f}.",
-        f"The lowest performing campaign was '{s['worst_campaign']}' with ROAS {s['worst_roas']:.2f}.",
-        f"Overall ROAS was {s['avg_roas']:.2f}."
-    ]
-    return insights
+def generate_insights(summary_stats, n=4):
+    fields = dict(summary_stats, ctr_pct=summary_stats['avg_ctr'] * 100)
+    return [template.format(**fields) for template in INSIGHT_TEMPLATES[:n]]
 
-def create_performance_chart(data, output_path):
-    campaign_totals = data.groupby('campaign')[['impressions','clicks','revenue']].sum()
+def create_performance_chart(campaign_stats, output_path):
+    if len(campaign_stats) > 15:
+        campaign_stats = campaign_stats.nlargest(15, 'revenue')
 
-    if len(campaign_totals) > 15:
-        campaign_totals = campaign_totals.nlargest(15, 'revenue')
+    campaign_totals = campaign_stats[['impressions','clicks','revenue']]
 
-    fig, ax = plt.subplots(figsize=(12, 7))
+    fig = Figure(figsize=(12, 7), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
 
-    x = range(len(campaign_totals))
+    x = np.arange(len(campaign_totals))
     width = 0.25
 
-    ax.bar([i - width for i in x], campaign_totals['impressions'], width)
+    ax.bar(x - width, campaign_totals['impressions'], width)
     ax.bar(x, campaign_totals['clicks'], width)
-    ax.bar([i + width for i in x], campaign_totals['revenue'], width)
+    ax.bar(x + width, campaign_totals['revenue'], width)
 
-    ax.set_xticks(list(x))
+    ax.set_xticks(x)
     ax.set_xticklabels(campaign_totals.index, rotation=45, ha='right')
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150)
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(output_path)
 
     return output_path
 
@@ -171,14 +366,10 @@ def create_powerpoint_report(summary_stats, insights, chart_path, output_path):
 
     slide2 = pres.slides.add_slide(pres.slide_layouts[1])
     slide2.shapes.title.text = "Executive Summary"
-    tf = slide2.placeholders[1].text_frame
-    for i in insights[:4]:
-        p = tf.add_paragraph()
-        p.text = f"• {i}"
+    slide2.placeholders[1].text_frame.text = "\n".join(f"• {i}" for i in insights[:4])
 
     slide3 = pres.slides.add_slide(pres.slide_layouts[1])
     slide3.shapes.title.text = "Key Performance Indicators"
-    tf = slide3.placeholders[1].text_frame
 
     s = summary_stats
     metrics = [
@@ -190,10 +381,7 @@ def create_powerpoint_report(summary_stats, insights, chart_path, output_path):
         f"Avg CPC: ${s['avg_cpc']:.2f}",
         f"Avg ROAS: {s['avg_roas']:.2f}"
     ]
-
-    for m in metrics:
-        p = tf.add_paragraph()
-        p.text = m
+    slide3.placeholders[1].text_frame.text = "\n".join(metrics)
 
     slide4 = pres.slides.add_slide(pres.slide_layouts[5])
     slide4.shapes.title.text = "Campaign Performance Overview"
@@ -202,10 +390,10 @@ def create_powerpoint_report(summary_stats, insights, chart_path, output_path):
     if 'top_5_campaigns' in summary_stats:
         slide5 = pres.slides.add_slide(pres.slide_layouts[1])
         slide5.shapes.title.text = "Top 5 Campaigns"
-        tf = slide5.placeholders[1].text_frame
-        for i, (camp, stats) in enumerate(summary_stats['top_5_campaigns'].items(), 1):
-            p = tf.add_paragraph()
-            p.text = f"{i}. {camp}: ${stats['revenue']:,.2f} (ROAS {stats['roas']:.2f})"
+        slide5.placeholders[1].text_frame.text = "\n".join(
+            f"{i}. {camp}: ${stats['revenue']:,.2f} (ROAS {stats['roas']:.2f})"
+            for i, (camp, stats) in enumerate(summary_stats['top_5_campaigns'].items(), 1)
+        )
 
     pres.save(output_path)
     return output_path
@@ -214,19 +402,28 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', type=str, default='data/marketing_campaign_dataset.csv')
     parser.add_argument('--output', type=str, default='output')
+    parser.add_argument('--engine', choices=['pandas','polars'], default='pandas')
     args = parser.parse_args()
 
     output_dir = Path(args.output)
     output_dir.mkdir(exist_ok=True, parents=True)
 
-    raw = load_campaign_data(args.input)
-    colmap = check_data_columns(raw)
-    clean = clean_and_prepare_data(raw, colmap)
-    summary = calculate_summary_stats(clean)
+    colmap = check_data_columns(read_csv_header(args.input))
+    check_required_columns(colmap)
+
+    cache_path = campaign_cache_path(args.input, colmap, args.engine, output_dir / '.cache')
+    campaign_sums = load_campaign_cache(cache_path)
+    if campaign_sums is None:
+        if args.engine == 'polars':
+            campaign_sums = aggregate_with_polars(args.input, colmap)
+        else:
+            campaign_sums = stream_and_aggregate(args.input, colmap)
+        save_campaign_cache(campaign_sums, cache_path)
+    summary, campaign_stats = calculate_summary_stats(campaign_sums)
     insights = generate_insights(summary)
 
     chart_path = output_dir / "campaign_performance.png"
-    create_performance_chart(clean, chart_path)
+    create_performance_chart(campaign_stats, chart_path)
 
     ppt_path = output_dir / "campaign_report.pptx"
     create_powerpoint_report(summary, insights, chart_path, ppt_path)